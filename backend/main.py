@@ -1,44 +1,137 @@
 import os
-from google import genai
-from google.genai import types
+import re
+import json
+import time
+import logging
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
+import functools
 from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import builtins
 import tree_sitter
 import tree_sitter_python as tsp
-import inspect
-import builtins
 from enum import Enum
 
-from openai_search import get_url_content_as_string
+import aiohttp
+
+from openai_search import get_url_content_as_string_async
 
 
+logger = logging.getLogger(__name__)
+
 PY_LANG = tree_sitter.Language(tsp.language())
-builtin_names = set([
-    name for name in dir(builtins)
-    if inspect.isbuiltin(getattr(builtins, name))   # built-in functions like print
-    or inspect.isfunction(getattr(builtins, name))  # rarely used but covers some cases
-    or inspect.isclass(getattr(builtins, name))     # types and classes
-])
+# parser construction is not free, do it once at import
+PARSER = tree_sitter.Parser(PY_LANG)
+# /symbol_locations wants to skip anything resolvable as a builtin, including
+# constants like None and exception types; dir(builtins) covers them all and
+# is cheap, unlike the old inspect-based filtering
+builtin_names = frozenset(dir(builtins))
+
+
+def _common_prefix_len(a: bytes, b: bytes) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    block = 4096
+    while i < n:
+        if a[i:i + block] == b[i:i + block]:
+            i += block
+            continue
+        end = min(i + block, n)
+        while i < end and a[i] == b[i]:
+            i += 1
+        return i
+    return n
+
+
+def _common_suffix_len(a: bytes, b: bytes, max_len: int) -> int:
+    i = 0
+    while i < max_len and a[len(a) - 1 - i] == b[len(b) - 1 - i]:
+        i += 1
+    return i
+
+
+def _point_at(source: bytes, byte_offset: int) -> tuple[int, int]:
+    row = source.count(b'\n', 0, byte_offset)
+    line_start = source.rfind(b'\n', 0, byte_offset) + 1
+    return (row, byte_offset - line_start)
 
 
 class TreeCache:
-    def __init__(self):
-        self.cache: dict[str, tuple[float, tree_sitter.Tree]] = {}
-    
+    # bound memory by the cached source bytes; trees are roughly proportional
+    MAX_BYTES = 128 * 1024 * 1024
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.cache: OrderedDict[str, tuple[float, bytes, tree_sitter.Tree]] = OrderedDict()
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
     def get(self, filepath: str):
         file_modified_time = os.path.getmtime(filepath)
-        if filepath in self.cache and file_modified_time <= self.cache[filepath][0]:
-            return self.cache[filepath][1]
+        with self.lock:
+            cached = self.cache.get(filepath)
+            if cached and file_modified_time <= cached[0]:
+                self.cache.move_to_end(filepath)
+                return cached[2]
 
         with open(filepath, 'rb') as f:
             source_code = f.read()
-        parser = tree_sitter.Parser(PY_LANG)
-        tree = parser.parse(source_code)
 
-        self.cache[filepath] = (file_modified_time, tree)
+        old_tree = None
+        if cached:
+            old_tree = self._edit_old_tree(cached[1], source_code, cached[2])
+        # parse() rejects an explicit None old tree
+        if old_tree is not None:
+            tree = PARSER.parse(source_code, old_tree)
+        else:
+            tree = PARSER.parse(source_code)
+
+        with self.lock:
+            old = self.cache.pop(filepath, None)
+            if old:
+                self.total_bytes -= len(old[1])
+            self.cache[filepath] = (file_modified_time, source_code, tree)
+            self.total_bytes += len(source_code)
+            while self.total_bytes > self.max_bytes and len(self.cache) > 1:
+                _, (_, evicted_source, _) = self.cache.popitem(last=False)
+                self.total_bytes -= len(evicted_source)
         return tree
+
+    def _edit_old_tree(self, old_source: bytes, new_source: bytes, old_tree: tree_sitter.Tree):
+        # apply the changed byte range as a single edit so tree-sitter can
+        # reuse the unchanged subtrees instead of reparsing from scratch
+        if old_source == new_source:
+            return old_tree
+
+        start_byte = _common_prefix_len(old_source, new_source)
+        suffix_len = _common_suffix_len(old_source, new_source, min(len(old_source), len(new_source)) - start_byte)
+        old_end_byte = len(old_source) - suffix_len
+        new_end_byte = len(new_source) - suffix_len
+
+        # a single prefix/suffix edit over a mostly-rewritten file (e.g. a
+        # checkout of another branch) buys nothing, just reparse from scratch
+        if new_end_byte - start_byte > len(new_source) // 2:
+            return None
+
+        # edit a copy: request handlers on other threads may still be walking
+        # the cached tree they got from an earlier get()
+        edited_tree = old_tree.copy()
+        edited_tree.edit(
+            start_byte=start_byte,
+            old_end_byte=old_end_byte,
+            new_end_byte=new_end_byte,
+            start_point=_point_at(old_source, start_byte),
+            old_end_point=_point_at(old_source, old_end_byte),
+            new_end_point=_point_at(new_source, new_end_byte),
+        )
+        return edited_tree
         
 
 tree_cache = TreeCache()
@@ -53,7 +146,14 @@ class LLMContextEntry(BaseModel):
     type: LLMContextType
     context: str
 
+class ContextText(BaseModel):
+    context: str
+    web_search_enabled: bool = False
+
 class Context(BaseModel):
+    # the IDE extension is a trusted caller, skip per-field normalization
+    model_config = ConfigDict(extra='ignore', str_strip_whitespace=False)
+
     main_text: str | None = None
     supplementary_text: list[str] = []
     urls: list[str] = []
@@ -79,7 +179,68 @@ class SymbolLocation(BaseModel):
     expand_to_class: bool = False
 
 
-app = FastAPI()
+# coalesce /suggest requests that arrive close together into one Gemini call
+BATCH_WINDOW_S = 0.05
+MAX_BATCH = 8
+
+suggest_queue: asyncio.Queue = None
+http_session: aiohttp.ClientSession = None
+
+
+# explicit Gemini cache for the system prompt, so its tokens are not re-prefilled per request
+CACHE_TTL_S = 3600
+
+cached_system_content: str | None = None
+
+
+def create_system_prompt_cache():
+    global cached_system_content
+    try:
+        # inside the try: client construction itself raises without a
+        # GEMINI_API_KEY, and that must not take down the server — the
+        # tree-sitter endpoints work fine without Gemini
+        client, types = get_genai()
+        cache = client.caches.create(
+            model='gemini-2.5-pro',
+            config=types.CreateCachedContentConfig(
+                system_instruction=[
+                    types.Part.from_text(text=system_prompt),
+                ],
+                ttl=f'{CACHE_TTL_S}s',
+            ),
+        )
+        cached_system_content = cache.name
+    except Exception as e:
+        logger.warning('Failed to create system prompt cache: %s', e)
+        cached_system_content = None
+
+
+async def refresh_system_prompt_cache():
+    # initial create runs here rather than in lifespan, so server readiness
+    # doesn't block on a Gemini network round trip
+    await asyncio.to_thread(create_system_prompt_cache)
+    while cached_system_content is not None:
+        # recreate the cache before its TTL expires; stop once a create
+        # fails (e.g. the prompt is below the model's minimum cacheable
+        # size) instead of retrying a known-failing call every hour
+        await asyncio.sleep(CACHE_TTL_S * 0.9)
+        await asyncio.to_thread(create_system_prompt_cache)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global suggest_queue, http_session
+    suggest_queue = asyncio.Queue()
+    http_session = aiohttp.ClientSession()
+    batch_task = asyncio.create_task(suggest_batch_loop())
+    cache_refresh_task = asyncio.create_task(refresh_system_prompt_cache())
+    yield
+    batch_task.cancel()
+    cache_refresh_task.cancel()
+    await http_session.close()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -90,24 +251,117 @@ app.add_middleware(
 )
 
 
-"""
-client = genai.Client(
-    api_key=os.environ.get("GEMINI_API_KEY"),
-)
-"""
+system_prompt = '''\
+You are a code completion assistant.
+Given context and source code, suggest the three most likely next lines of code.
+Return exactly three completions, separated by lines that contain only '---'.
+Only return the code itself. Do not use markdown, backticks, or any other formatting.
+
+Example:
+
+Input:
+import os
+
+# get path to folder where this file is in
+
+Output:
+folder = os.path.dirname(os.path.abspath(__file__))
+---
+folder = os.path.dirname(__file__)
+---
+folder = os.path.abspath(os.path.dirname(__file__))
+'''
+
+@functools.lru_cache(maxsize=1)
+def get_genai():
+    # google.genai drags in grpc/protobuf; keep it out of cold start and only
+    # pay for the import + client construction on first use
+    from google import genai
+    from google.genai import types
+    client = genai.Client(
+        api_key=os.environ.get("GEMINI_API_KEY"),
+    )
+    return client, types
+
+
+@functools.lru_cache(maxsize=1)
+def get_exa():
+    from exa_py import Exa
+    return Exa(api_key=os.environ.get("EXA_API_KEY"))
 
 def parse_llm_completion_output(output: str) -> list[str]:
-    print(output)
-    parts = output.split('---')
-    print(parts)
-    if len(parts) != 3:
-        raise ValueError(f"Expected exactly 3 completions separated by '---', but found {len(parts)}.")
+    first, sep, rest = output.partition('---')
+    if not sep:
+        raise ValueError("Expected exactly 3 completions separated by '---', but found 1.")
+    second, sep, third = rest.partition('---')
+    if not sep or '---' in third:
+        raise ValueError("Expected exactly 3 completions separated by '---'.")
+
+    # strip once and validate on the result, so an all-whitespace completion
+    # fails loudly instead of silently shrinking the list
+    completions = [completion.strip(' \n\t`') for completion in (first, second, third)]
+    if not all(completions):
+        raise ValueError("Expected 3 non-empty completions separated by '---'.")
+    return completions
+
+
+# editor retries and backspace-retype patterns resend identical prompts;
+# with temperature=0 the completions are deterministic, so cache them
+LLM_CACHE_TTL_S = 3600
+LLM_CACHE_MAX_ENTRIES = 256
+
+llm_cache: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+llm_cache_lock = threading.Lock()
+
+
+def llm_cache_key(model: str, context: str, web_search: bool = False) -> str:
+    payload = json.dumps({'m': model, 'sys': system_prompt, 'ctx': context, 'ws': web_search}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def llm_cache_get(key: str) -> list[str] | None:
+    with llm_cache_lock:
+        cached = llm_cache.get(key)
+        if not cached or time.time() - cached[0] >= LLM_CACHE_TTL_S:
+            return None
+        llm_cache.move_to_end(key)
+        return cached[1]
+
 
-    return [completion.strip(' \n\t`') for completion in parts if completion.strip(' \n\t`')]
+def llm_cache_put(key: str, completions: list[str]):
+    with llm_cache_lock:
+        llm_cache[key] = (time.time(), completions)
+        llm_cache.move_to_end(key)
+        while len(llm_cache) > LLM_CACHE_MAX_ENTRIES:
+            llm_cache.popitem(last=False)
 
 
-def generate(context: str):
+# keep pathological contexts below the model's window; completion only cares
+# about the tail anyway
+MAX_CONTEXT_BYTES = 64 * 1024
+MAX_CONTEXT_LINES = 1000
+
+
+def clip_context(context: str) -> str:
+    if len(context) > MAX_CONTEXT_BYTES:
+        context = context[-MAX_CONTEXT_BYTES:]
+    lines = context.splitlines()
+    if len(lines) > MAX_CONTEXT_LINES:
+        context = '\n'.join(lines[-MAX_CONTEXT_LINES:])
+    return context
+
+
+async def generate(context: str, web_search: bool = False):
+    client, types = get_genai()
     model = 'gemini-2.5-pro'
+    context = clip_context(context)
+
+    cache_key = llm_cache_key(model, context, web_search)
+    cached_completions = llm_cache_get(cache_key)
+    if cached_completions is not None:
+        for completion in cached_completions:
+            yield completion
+        return
 
     contents = [
         types.Content(
@@ -117,113 +371,333 @@ def generate(context: str):
             ],
         ),
     ]
-    generate_content_config = types.GenerateContentConfig(
-        thinking_config = types.ThinkingConfig(
+    config_kwargs = dict(
+        thinking_config=types.ThinkingConfig(
             thinking_budget=128,
         ),
+        temperature=0,
+    )
+    if web_search:
+        # the model searches server-side in the same round trip, no separate
+        # query-generation and retrieval calls needed
+        config_kwargs['tools'] = [types.Tool(google_search=types.GoogleSearch())]
+    if cached_system_content and not web_search:
+        config_kwargs['cached_content'] = cached_system_content
+    else:
+        # inline fallback; tools cannot be combined with cached content
+        config_kwargs['system_instruction'] = [types.Part.from_text(text=system_prompt)]
+    generate_content_config = types.GenerateContentConfig(**config_kwargs)
+
+    start_time = time.time()
+    # stream so the first completion is available before the full response is generated
+    completions = []
+    buffer = ''
+    async for chunk in await client.aio.models.generate_content_stream(
+        model=model,
+        contents=contents,
+        config=generate_content_config,
+    ):
+        if not chunk.text:
+            continue
+        buffer += chunk.text
+        while '---' in buffer:
+            completion, _, buffer = buffer.partition('---')
+            completion = completion.strip(' \n\t`')
+            if completion:
+                completions.append(completion)
+                yield completion
+    completion = buffer.strip(' \n\t`')
+    if completion:
+        completions.append(completion)
+        yield completion
+    logger.info('inference_time=%.2fs', time.time() - start_time)
+
+    # temperature is 0, identical prompts give identical completions; but
+    # don't pin a malformed response (fewer than the expected 3 completions)
+    # into the cache for an hour
+    if len(completions) == 3:
+        llm_cache_put(cache_key, completions)
+    else:
+        logger.warning('not caching malformed completion output (%d parts)', len(completions))
+
+
+search_query_system_prompt = '''\
+You are given source code that is currently being edited.
+Return a single short web search query that would find documentation helpful for completing the next line.
+Only return the query text and nothing else.
+'''
+
+
+# temperature=0 makes the query deterministic per context, and Exa results
+# are stable enough short-term; repeated editor triggers skip both round trips
+SEARCH_QUERY_CACHE_MAX_ENTRIES = 512
+SEARCH_RESULT_TTL_S = 600
+SEARCH_RESULT_CACHE_MAX_ENTRIES = 128
+
+search_query_cache: OrderedDict[str, str] = OrderedDict()
+search_result_cache: OrderedDict[str, tuple[float, str]] = OrderedDict()
+search_cache_lock = threading.Lock()
+
+
+async def generate_search_query(context: str) -> str:
+    client, types = get_genai()
+    model = 'gemini-2.5-flash'
+    context = clip_context(context)
+
+    cache_key = hashlib.blake2b(context.encode(), digest_size=16).hexdigest()
+    with search_cache_lock:
+        cached_query = search_query_cache.get(cache_key)
+        if cached_query is not None:
+            search_query_cache.move_to_end(cache_key)
+    if cached_query is not None:
+        return cached_query
+
+    contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(text=context),
+            ],
+        ),
+    ]
+    generate_content_config = types.GenerateContentConfig(
         system_instruction=[
-            types.Part.from_text(text=system_prompt),
+            types.Part.from_text(text=search_query_system_prompt),
         ],
         temperature=0
-    ) 
+    )
 
-    import time
-    start_time = time.time()
-    ret = parse_llm_completion_output(client.models.generate_content(
+    response = await client.aio.models.generate_content(
         model=model,
         contents=contents,
         config=generate_content_config,
-    ).text)
-    print('inference time:', round(time.time() - start_time), 2)
+    )
+    search_query = response.text.strip()
 
-    return ret
+    with search_cache_lock:
+        search_query_cache[cache_key] = search_query
+        while len(search_query_cache) > SEARCH_QUERY_CACHE_MAX_ENTRIES:
+            search_query_cache.popitem(last=False)
+    return search_query
 
 
-@app.post('/suggest')
-async def suggest(contextText: Context):
-    print('on /suggest')
-    if contextText.webSearchenabled:
-        search_results = search(contextText.context)
-    else:
-        search_results = None
+async def search(context: str) -> str:
+    search_query = await generate_search_query(context)
 
-    context = f'{search_results}\n\nSource Code:\n{contextText.context}'
+    with search_cache_lock:
+        cached_results = search_result_cache.get(search_query)
+        if cached_results and time.time() - cached_results[0] < SEARCH_RESULT_TTL_S:
+            search_result_cache.move_to_end(search_query)
+            return cached_results[1]
 
-    print('context:')
-    print(context)
+    # exa_py is synchronous, keep it off the event loop
+    results = await asyncio.to_thread(get_exa().search_and_contents, search_query, num_results=3, text=True)
+    search_results = '\n\n'.join(result.text for result in results.results if result.text)
 
-    return {
-        'response': generate(context)
-    }
+    with search_cache_lock:
+        search_result_cache[search_query] = (time.time(), search_results)
+        while len(search_result_cache) > SEARCH_RESULT_CACHE_MAX_ENTRIES:
+            search_result_cache.popitem(last=False)
+    return search_results
 
 
-def get_called_functions_and_classes(src_code: str):
-    parser = tree_sitter.Parser(PY_LANG)
-    tree = parser.parse(src_code)
+batch_system_prompt = '''\
+Multiple independent completion requests follow, each marked by a '### REQ <i>' header.
+Answer every request in order. Start each answer with a line that contains only '### RESP <i>',
+followed by the three completions for that request as described above.
+'''
+
 
-    query_string = """
-    [
-      ;; Case 1: Matches simple calls like `print()`
-      (call
-        function: (identifier) @function_name)
+async def generate_batched(contexts: list[str], web_search: bool = False) -> list[list[str]]:
+    client, types = get_genai()
+    model = 'gemini-2.5-pro'
 
-      ;; Case 2: Matches attribute calls like `obj.method()`
-      ;; and captures only the final 'method' part.
-      (call
-        function: (attribute
-                   attribute: (identifier) @function_name))
+    prompt = '\n\n'.join(f'### REQ {i + 1}\n{clip_context(context)}' for i, context in enumerate(contexts))
+    contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(text=prompt),
+            ],
+        ),
     ]
-    """
+    generate_content_config = types.GenerateContentConfig(
+        thinking_config = types.ThinkingConfig(
+            thinking_budget=128,
+        ),
+        system_instruction=[
+            types.Part.from_text(text=system_prompt),
+            types.Part.from_text(text=batch_system_prompt),
+        ],
+        tools=[types.Tool(google_search=types.GoogleSearch())] if web_search else None,
+        temperature=0
+    )
+
+    response = await client.aio.models.generate_content(
+        model=model,
+        contents=contents,
+        config=generate_content_config,
+    )
+    blocks = re.split(r'### RESP \d+', response.text)[1:]
+    if len(blocks) != len(contexts):
+        raise ValueError(f"Expected {len(contexts)} '### RESP' blocks, but found {len(blocks)}.")
 
-    query = tree_sitter.Query(PY_LANG, query_string)
-    cursor = tree_sitter.QueryCursor(query)
-    matches = cursor.matches(tree.root_node)
-    return matches
+    return [parse_llm_completion_output(block) for block in blocks]
 
 
-@app.post('/symbol_locations')
+async def suggest_batch_loop():
+    while True:
+        batch = [await suggest_queue.get()]
+        try:
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(await asyncio.wait_for(suggest_queue.get(), timeout=BATCH_WINDOW_S))
+                except asyncio.TimeoutError:
+                    break
+
+            # a request may have been cancelled while queued (client
+            # disconnect, shutdown); resolving its future would raise
+            # InvalidStateError and kill this singleton task
+            batch = [item for item in batch if not item[2].cancelled()]
+            if not batch:
+                continue
+
+            if len(batch) == 1:
+                # no concurrent requests; hand the stream itself back to the
+                # endpoint so completions are forwarded as they are parsed
+                context, web_search, future = batch[0]
+                future.set_result(generate(context, web_search))
+                continue
+
+            batch_web_search = any(web_search for _, web_search, _ in batch)
+            try:
+                results = await generate_batched([context for context, _, _ in batch], batch_web_search)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                continue
+            for (context, web_search, future), completions in zip(batch, results):
+                llm_cache_put(llm_cache_key('gemini-2.5-pro', clip_context(context), web_search), completions)
+                if not future.cancelled():
+                    future.set_result(completions)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # never let a stray error end the drain loop: /suggest would
+            # hang forever on an unserviced queue
+            logger.exception('suggest batch loop iteration failed')
+
+
+@app.post('/suggest')
+async def suggest(contextText: ContextText):
+    logger.debug('on /suggest')
+    # Google-grounded generation folds query generation, retrieval and
+    # completion into one round trip; the Exa chain stays available when a
+    # non-Google retrieval source is configured
+    use_exa_search = contextText.web_search_enabled and bool(os.environ.get('EXA_API_KEY'))
+    if use_exa_search:
+        search_results = await search(contextText.context)
+    else:
+        search_results = None
+
+    # keep the volatile search results at the end, so provider-side prompt
+    # caching can reuse the system prompt + source code prefix
+    context = f'Source Code:\n{contextText.context}'
+    if search_results:
+        context += f'\n\nSearch Results:\n{search_results}'
+
+    logger.debug('context: %s', context)
+
+    web_search = contextText.web_search_enabled and not use_exa_search
+    future = asyncio.get_running_loop().create_future()
+    await suggest_queue.put((context, web_search, future))
+    # either a finished list (demuxed from a batched call) or a live stream
+    completions = await future
+
+    async def completion_events():
+        if isinstance(completions, list):
+            for completion in completions:
+                yield f'data: {json.dumps({"response": completion})}\n\n'
+        else:
+            async for completion in completions:
+                yield f'data: {json.dumps({"response": completion})}\n\n'
+
+    return StreamingResponse(completion_events(), media_type='text/event-stream')
+
+
+def walk_calls(node: tree_sitter.Node, start_line: int, end_line: int, out: list):
+    """Collects the name node of every call site, like the old call query but
+    without the per-request QueryCursor and match tuple allocations. Subtrees
+    outside the line range are pruned without descending into them."""
+    if node.end_point.row < start_line or node.start_point.row > end_line:
+        return
+    if node.type == 'call':
+        function_node = node.child_by_field_name('function')
+        if function_node is not None:
+            if function_node.type == 'identifier':
+                out.append(function_node)
+            elif function_node.type == 'attribute':
+                # only the final 'method' part of obj.method()
+                attribute_node = function_node.child_by_field_name('attribute')
+                if attribute_node is not None and attribute_node.type == 'identifier':
+                    out.append(attribute_node)
+    for child in node.children:
+        walk_calls(child, start_line, end_line, out)
+
+
+@app.post('/symbol_locations', response_model=None)
 async def symbols(contextLocation: ContextLocation):
-    with open(contextLocation.path, 'rb') as f:
-        # maybe we can to give tree-sitter a partial file, but for now lets not risk it
-        context = f.read()  # contextLocation.start_line:contextLocation.end_line + 1]
-    matches = get_called_functions_and_classes(context)
+    # the parse is shared with /symbol_source via the tree cache
+    tree = tree_cache.get(contextLocation.path)
+    call_nodes = []
+    walk_calls(tree.root_node, contextLocation.start_line, contextLocation.end_line, call_nodes)
 
     symbols = []
-    for match in matches:
-        match = match[1]['function_name'][0]
-        name = match.text.decode('utf-8')
-        if name in builtin_names:
+    for node in call_nodes:
+        # a call can span the range boundary, its name node may still be outside
+        if node.start_point.row < contextLocation.start_line or node.start_point.row > contextLocation.end_line:
             continue
-        if match.start_point.row < contextLocation.start_line or match.start_point.row > contextLocation.end_line:
+        name = node.text.decode('utf-8')
+        if name in builtin_names:
             continue
-        symbols.append((name, match.start_point.row, match.start_point.column))
-    
-    return symbols
+        symbols.append((name, node.start_point.row, node.start_point.column))
 
+    return ORJSONResponse(symbols)
 
-@app.post('/symbol_source')
-async def symbol_source(symbol_locations: list[SymbolLocation]):
-    ret = []
 
-    for symbol_location in symbol_locations:
-        tree = tree_cache.get(symbol_location.path)
+def _resolve_symbols_in_file(path: str, indexed_locations: list[tuple[int, SymbolLocation]], out: list):
+    tree = tree_cache.get(path)
+    target_node_types = {'function_definition', 'class_definition'}
+    # symbols in the same class share ancestor chains; remember where an
+    # already-walked node ended up instead of re-walking it
+    definition_memo: dict[int, tree_sitter.Node | None] = {}
+
+    for index, symbol_location in indexed_locations:
         node = tree.root_node.named_descendant_for_point_range((symbol_location.startLine, symbol_location.startCol), (symbol_location.endLine, symbol_location.endCol))
         if not node:
             continue
 
-        target_node_types = {'function_definition', 'class_definition'}
-
-        while node and node.type not in target_node_types:
+        walked = []
+        while node is not None and node.type not in target_node_types:
+            if node.id in definition_memo:
+                node = definition_memo[node.id]
+                break
+            walked.append(node.id)
             node = node.parent
-        
+        for node_id in walked:
+            definition_memo[node_id] = node
+
         if not node or node.type not in target_node_types:
             continue
 
-        node_func_name = node.child_by_field_name('name').text.decode('utf-8')
-        if symbol_location.name and symbol_location.name not in node_func_name:
+        # compare in bytes, decoding the definition text here would copy the
+        # whole function/class body before we know it is needed
+        node_func_name = node.child_by_field_name('name').text
+        if symbol_location.name and symbol_location.name.encode() not in node_func_name:
             # occurs in e.g. a '# def xyz ... ' comment
             continue
-    
+
         if node.type == 'function_definition' and symbol_location.expand_to_class:
             parent = node.parent
             while parent:
@@ -231,13 +705,26 @@ async def symbol_source(symbol_locations: list[SymbolLocation]):
                     node = parent
                 parent = parent.parent
 
-        ret.append({
+        out[index] = {
             'start_line': node.start_point.row,
             'start_col': node.start_point.column,
-            'text': node.text.decode('utf-8')
-        })
-    
-    return ret
+            'text': node.text.decode('utf-8', errors='replace')
+        }
+
+
+@app.post('/symbol_source', response_model=None)
+async def symbol_source(symbol_locations: list[SymbolLocation]):
+    # group by file so each file is parsed and walked once; files run concurrently
+    by_path: dict[str, list[tuple[int, SymbolLocation]]] = defaultdict(list)
+    for index, symbol_location in enumerate(symbol_locations):
+        by_path[symbol_location.path].append((index, symbol_location))
+
+    results: list = [None] * len(symbol_locations)
+    await asyncio.gather(*(
+        asyncio.to_thread(_resolve_symbols_in_file, path, indexed_locations, results)
+        for path, indexed_locations in by_path.items()
+    ))
+    return ORJSONResponse([result for result in results if result])
 
 
 def make_section(tag: str, title: str, content: str) -> str:
@@ -261,7 +748,38 @@ def make_code_section(tag: str, title: str, content: str, language) -> str:
 '''
 
 
-@app.post('/context')
+# developers tend to reference the same docs across many completion requests,
+# keep recently fetched pages around for a while
+URL_CACHE_TTL_S = 600
+URL_CACHE_MAX_ENTRIES = 128
+
+url_cache: OrderedDict[str, tuple[float, str]] = OrderedDict()
+url_cache_lock = asyncio.Lock()
+
+
+async def fetch_url_cached(url: str) -> str:
+    async with url_cache_lock:
+        cached = url_cache.get(url)
+        if cached and time.time() - cached[0] < URL_CACHE_TTL_S:
+            url_cache.move_to_end(url)
+            return cached[1]
+
+    page_content = await get_url_content_as_string_async(url, http_session)
+
+    async with url_cache_lock:
+        url_cache[url] = (time.time(), page_content)
+        url_cache.move_to_end(url)
+        while len(url_cache) > URL_CACHE_MAX_ENTRIES:
+            url_cache.popitem(last=False)
+    return page_content
+
+
+def _read_file(filepath: str) -> str:
+    with open(filepath, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@app.post('/context', response_model=None)
 async def get_context(context: Context):
     sections = []
 
@@ -272,29 +790,36 @@ async def get_context(context: Context):
         combined_supplementary = "\n\n---\n\n".join(context.supplementary_text)
         sections.append(make_section("CONTEXT", "Additional Information", combined_supplementary))
 
+    filepaths = []
     for rel_filepath in context.filepaths:
         if context.workspace_root:
             filepath = os.path.join(context.workspace_root, rel_filepath)
         else:
             filepath = rel_filepath
+        filepaths.append(filepath)
 
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                filecontent = f.read()
-            language = 'python' if filecontent.endswith('.py') else ''
-            sections.append(make_code_section("FILE", rel_filepath, filecontent, language))
-        except Exception as e:
-            print(f"Failed to read {filepath}: {e}")
-
-    for url in context.urls:
-        try:
-            page_content = get_url_content_as_string(url)
-            sections.append(make_section("URL", url, page_content))
-        except Exception as e:
-            print(f"Failed to get page content for {url}: {e}")
+    # file reads and URL fetches are independent, run them all concurrently
+    file_contents = await asyncio.gather(
+        *(asyncio.to_thread(_read_file, filepath) for filepath in filepaths),
+        return_exceptions=True,
+    )
+    page_contents = await asyncio.gather(
+        *(fetch_url_cached(url) for url in context.urls),
+        return_exceptions=True,
+    )
 
-    if context.main_text:
-        sections.append(make_section("TASK", "Main Content", context.main_text))
+    for rel_filepath, filepath, filecontent in zip(context.filepaths, filepaths, file_contents):
+        if isinstance(filecontent, Exception):
+            logger.warning("Failed to read %s: %s", filepath, filecontent)
+            continue
+        language = 'python' if rel_filepath.endswith('.py') else ''
+        sections.append(make_code_section("FILE", rel_filepath, filecontent, language))
+
+    for url, page_content in zip(context.urls, page_contents):
+        if isinstance(page_content, Exception):
+            logger.warning("Failed to get page content for %s: %s", url, page_content)
+            continue
+        sections.append(make_section("URL", url, page_content))
 
     return "\n\n---\n\n".join(sections)
 
@@ -304,7 +829,12 @@ def main():
         "main:app",
         host="127.0.0.1",
         port=7524,
-        workers=1,
+        # LLM calls are I/O bound, but more workers still help with the CPU-bound
+        # tree-sitter endpoints; 2n+1 like gunicorn recommends, capped at 8
+        workers=min(8, (os.cpu_count() or 2) * 2 + 1),
+        loop="uvloop",
+        http="httptools",
+        log_level="warning",
         reload=False
     )
 
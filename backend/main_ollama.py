@@ -1,4 +1,6 @@
 import os
+import time
+import asyncio
 from google import genai
 from google.genai import types
 from fastapi import FastAPI
@@ -22,18 +24,21 @@ app.add_middleware(
 
 # TODO: fix language
 # TODO: if suggestion returns import, add to prompt and propmt again with max 3 iterations
-def get_prompt(code_lines: str):
-    return f"""
+_PROMPT_PREFIX = """
 You are a code completion assistant.
 Given the following lines of code, what is the single next line?
 Only return the code for the very next line and nothing else. Do not use markdown, backticks, or any other formatting.
 
 Code:
 ```python
-{code_lines}
+"""
+_PROMPT_SUFFIX = """
 ```
 """
 
+def get_prompt(code_lines: str):
+    return _PROMPT_PREFIX + code_lines + _PROMPT_SUFFIX
+
 client = genai.Client(
     api_key=os.environ.get("GEMINI_API_KEY"),
 )
@@ -51,7 +56,6 @@ def generate(context: str):
     ]
     generate_content_config = types.GenerateContentConfig()
 
-    import time
     print('start generating', time.time())
     ret = [client.models.generate_content(
         model=model,
@@ -63,8 +67,9 @@ def generate(context: str):
 
 @app.post('/suggest')
 async def suggest(contextText: ContextText):
+    # generate blocks on the API call, keep it off the event loop
     return {
-        'suggestions': generate(contextText.context)
+        'suggestions': await asyncio.to_thread(generate, contextText.context)
     }
 
 def main():
@@ -1,15 +1,43 @@
 # Inspired by https://github.com/openai/gpt-oss/tree/main/gpt_oss/tools/simple_browser
 
 import re
+import asyncio
+import functools
 from urllib.parse import urljoin, urlparse
 
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import html2text
 import lxml.html
 import lxml.etree
 import pydantic
 
 
+# keep-alive connection pool so repeated fetches skip the TCP/TLS handshake
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.2))
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
+_SESSION.headers["User-Agent"] = "lineCompletion"
+
+# compiled once; these run on every (potentially large) fetched page
+_SMP_RE = re.compile(r"[\U00010000-\U0001FFFF]")
+_WS_RE = re.compile(r"\s+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n")
+
+# tags that should start/end on their own line in the extracted text
+_BLOCK_TAGS = frozenset({
+    'p', 'div', 'ul', 'ol', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'pre', 'table', 'tr', 'blockquote',
+})
+
+# compiled XPath evaluators; findall would re-compile the expression per page
+_A_XPATH = lxml.etree.XPath(".//a[@href]")
+_IMG_XPATH = lxml.etree.XPath(".//img")
+
+
 class PageContents(pydantic.BaseModel):
     """A model to hold the processed page content."""
     url: str
@@ -20,8 +48,7 @@ class PageContents(pydantic.BaseModel):
 
 def remove_unicode_smp(text: str) -> str:
     """Removes Unicode characters in the Supplemental Multilingual Plane (SMP)."""
-    smp_pattern = re.compile(r"[\U00010000-\U0001FFFF]", re.UNICODE)
-    return smp_pattern.sub("", text)
+    return _SMP_RE.sub("", text)
 
 def replace_node_with_text(node: lxml.html.HtmlElement, text: str) -> None:
     """Replaces an lxml node with plain text."""
@@ -36,8 +63,10 @@ def replace_node_with_text(node: lxml.html.HtmlElement, text: str) -> None:
         previous.tail = (previous.tail or "") + text + tail
     parent.remove(node)
 
+@functools.lru_cache(maxsize=4096)
 def get_domain(url: str) -> str:
-    """Extracts the domain from a URL."""
+    """Extracts the domain from a URL. Pages link to the same handful of
+    hosts over and over, so memoize the urlparse."""
     if "http" not in url:
         url = "http://" + url
     return urlparse(url).netloc
@@ -45,26 +74,32 @@ def get_domain(url: str) -> str:
 def _get_text(node: lxml.html.HtmlElement) -> str:
     """Gets all text from a node, merging whitespace."""
     text = " ".join(node.itertext())
-    return re.sub(r"\s+", " ", text).strip()
+    return _WS_RE.sub(" ", text).strip()
 
 def _clean_links(root: lxml.html.HtmlElement, cur_url: str) -> dict[str, str]:
     """Replaces <a> tags with a textual representation and returns a url map."""
     urls: dict[str, str] = {}
     cur_domain = get_domain(cur_url)
-    for i, a in enumerate(root.findall(".//a[@href]")):
+    for i, a in enumerate(_A_XPATH(root)):
         if a.getparent() is None:
             continue
         link = a.attrib["href"]
-        if link.startswith(("mailto:", "javascript:")):
+        if link.startswith(("mailto:", "javascript:", "#")):
+            # not joinable into a fetchable URL
             continue
         text = _get_text(a)
         if not text:
             text = "link" # provide default text if link has no text
         try:
-            link = urljoin(cur_url, link)
+            if not link.startswith(("http://", "https://")):
+                # relative links ('/x', 'guide.html', '../api') need resolving;
+                # fully-qualified ones can skip the urljoin pass
+                link = urljoin(cur_url, link)
             domain = get_domain(link)
-        except Exception:
-            domain = ""
+        except ValueError:
+            # malformed href (e.g. an invalid IPv6 literal); drop the link
+            # but keep the page
+            continue
         if not domain:
             continue
         
@@ -81,7 +116,7 @@ def _clean_links(root: lxml.html.HtmlElement, cur_url: str) -> dict[str, str]:
 
 def replace_images(root: lxml.html.HtmlElement) -> None:
     """Replaces <img> tags with their alt text."""
-    for i, img_tag in enumerate(root.findall(".//img")):
+    for i, img_tag in enumerate(_IMG_XPATH(root)):
         image_name = img_tag.get("alt", img_tag.get("title"))
         if image_name:
             replacement = f"[Image {i}: {image_name}]"
@@ -90,6 +125,43 @@ def replace_images(root: lxml.html.HtmlElement) -> None:
         replace_node_with_text(img_tag, replacement)
 
 
+def _collect_text(el: lxml.html.HtmlElement, parts: list) -> None:
+    """Appends the readable text of an element to parts. Inline whitespace is
+    collapsed, block tags get their own lines, <pre> content stays verbatim."""
+    tag = el.tag
+    if tag == 'pre':
+        parts.append('\n' + ''.join(el.itertext()).rstrip() + '\n')
+        return
+    if tag == 'br':
+        parts.append('\n')
+        return
+    if tag in _BLOCK_TAGS:
+        parts.append('\n')
+    if el.text:
+        parts.append(_WS_RE.sub(' ', el.text))
+    for child in el:
+        if isinstance(child.tag, str):  # skip comments and processing instructions
+            _collect_text(child, parts)
+        if child.tail:
+            parts.append(_WS_RE.sub(' ', child.tail))
+    if tag in _BLOCK_TAGS:
+        parts.append('\n')
+
+
+def tree_to_text(root: lxml.html.HtmlElement) -> str:
+    """Extracts clean text straight from the lxml tree, skipping the
+    serialize-and-reparse round trip through html2text."""
+    lxml.etree.strip_elements(root, "script", "style", "noscript", with_tail=False)
+    body = root.find("body")
+    if body is None:
+        # fragment without a body; at least keep the title out of the content
+        lxml.etree.strip_elements(root, "head", with_tail=False)
+        body = root
+    parts = []
+    _collect_text(body, parts)
+    return _BLANK_LINES_RE.sub('\n\n', ''.join(parts)).strip()
+
+
 def html_to_text(html: str) -> str:
     """Converts HTML to a clean text format."""
     h = html2text.HTML2Text()
@@ -123,14 +195,9 @@ def process_html(html: str, url: str) -> PageContents:
     urls = _clean_links(root, url)
     replace_images(root)
 
-    # Convert the cleaned tree back to HTML before final text conversion
-    clean_html = lxml.etree.tostring(root, encoding="UTF-8").decode()
-    
-    text = html_to_text(clean_html)
-    
-    # Final whitespace cleanup
-    text = re.sub(r"^\s+$", "", text, flags=re.MULTILINE)
-    text = re.sub(r"\n(\s*\n)+", "\n\n", text)
+    # links/images are already rewritten and emphasis/tables are ignored
+    # anyway, so plain text extraction matches what html2text produced
+    text = tree_to_text(root)
 
     return PageContents(
         url=url,
@@ -146,7 +213,7 @@ def get_url_content_as_string(url: str) -> str:
     single string with its processed content.
     """
     try:
-        response = requests.get(url, timeout=30)
+        response = _SESSION.get(url, timeout=30)
         response.raise_for_status()  # Raise an exception for bad status codes
         html_content = response.text
 
@@ -160,6 +227,27 @@ def get_url_content_as_string(url: str) -> str:
         return f"An unexpected error occurred: {e}"
 
 
+async def get_url_content_as_string_async(url: str, session: aiohttp.ClientSession) -> str:
+    """
+    aiohttp variant of get_url_content_as_string, for callers that fetch
+    multiple URLs concurrently over a shared session.
+    """
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+            response.raise_for_status()
+            html_content = await response.text()
+
+        # lxml/html2text are CPU bound, keep them off the event loop
+        page_contents = await asyncio.to_thread(process_html, html=html_content, url=url)
+
+        return page_contents.text
+
+    except aiohttp.ClientError as e:
+        return f"Error: Could not fetch URL content. Details: {e}"
+    except Exception as e:
+        return f"An unexpected error occurred: {e}"
+
+
 def main():
     """Main function to run the example."""
     target_url = 'https://github.com/MapIV/pypcd4'
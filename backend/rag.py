@@ -1,48 +1,147 @@
 import subprocess
 import os
+import mmap
+import bisect
+import pickle
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import tree_sitter
 import tree_sitter_python as tsp
-import json
-import dataclasses
+import orjson
 from dataclasses import dataclass
 import builtins
 import time
-import inspect
+import threading
 
 PY_LANG = tree_sitter.Language(tsp.language())
-builtin_names = set([
-    name for name in dir(builtins)
-    if inspect.isbuiltin(getattr(builtins, name))   # built-in functions like print
-    or inspect.isfunction(getattr(builtins, name))  # rarely used but covers some cases
-    or inspect.isclass(getattr(builtins, name))     # types and classes
-])
+# query compilation parses the S-expression and links node types, do it once at import
+CALL_QUERY = tree_sitter.Query(PY_LANG, """
+[
+  ;; Case 1: Matches simple calls like `print()`
+  (call
+    function: (identifier) @function_name)
+
+  ;; Case 2: Matches attribute calls like `obj.method()`
+  ;; and captures only the final 'method' part.
+  (call
+    function: (attribute
+               attribute: (identifier) @function_name))
+]
+""")
+FUNC_QUERY = tree_sitter.Query(PY_LANG, """
+(function_definition
+    name: (identifier) @function_name) @function_def
+""")
+# dunders can't appear as call names anyway, and skipping the per-name
+# inspect.isX(getattr(...)) calls makes importing this module cheaper
+builtin_names = frozenset(name for name in dir(builtins) if not name.startswith('_'))
+# tree-sitter hands out node text as bytes; filtering in bytes skips the
+# decode for the very common builtin call sites
+_BUILTIN_BYTES = frozenset(name.encode() for name in builtin_names)
+
+
+# parser construction allocates scratch buffers; reuse one per thread (each
+# ProcessPoolExecutor worker builds its own lazily on first parse)
+_tls = threading.local()
+
+
+def _get_parser() -> tree_sitter.Parser:
+    parser = getattr(_tls, 'parser', None)
+    if parser is None:
+        parser = _tls.parser = tree_sitter.Parser(PY_LANG)
+    return parser
 
 
 @dataclass
 class FunctionReference:
     filepath: str
     line: str
-    text: bytes
+    text: str
     last_modified_timestamp_epoch: float
 
 
+# below this, reading into a bytes object is cheaper than setting up a mapping
+_MMAP_THRESHOLD = 64 * 1024
+
+
+def _collect_ranges(tree: tree_sitter.Tree, source):
+    # slice the source instead of node.text: trees parsed via the read
+    # callable don't retain their source
+    cursor = tree_sitter.QueryCursor(FUNC_QUERY)
+    captures = cursor.captures(tree.root_node)
+
+    ranges = []
+    for node in captures.get('function_def', []):
+        name_node = node.child_by_field_name('name')
+        ranges.append((
+            node.start_point.row,
+            node.end_point.row,
+            source[name_node.start_byte:name_node.end_byte].decode('utf-8'),
+            source[node.start_byte:node.end_byte].decode('utf-8'),
+        ))
+    ranges.sort()
+    return ranges
+
+
+def _parse_file(filepath: str):
+    # runs in a ProcessPoolExecutor worker; tree-sitter Tree objects can't be
+    # pickled, so only the function ranges cross the process boundary
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= _MMAP_THRESHOLD:
+            # large files: parse straight off the page cache instead of
+            # copying the whole source into a Python bytes object
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                tree = _get_parser().parse(lambda byte_offset, point: mm[byte_offset:byte_offset + 4096])
+                return _collect_ranges(tree, mm)
+        source_code = f.read()
+    tree = _get_parser().parse(source_code)
+    return _collect_ranges(tree, source_code)
+
+
+# per-user location: unpickling from a world-writable path like /tmp would
+# mean loading bytes another local user could have planted
+TREE_CACHE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+    'linecompletion', 'treecache.pkl')
+
+
 class TreeCache:
     def __init__(self):
-        self.cache: dict[str, tuple[float, tree_sitter.Tree]] = {}
-    
-    def get(self, filepath: str):
-        file_modified_time = os.path.getmtime(filepath)
-        if filepath in self.cache and file_modified_time <= self.cache[filepath][0]:
+        # filepath -> (mtime, sorted function ranges from _parse_file)
+        self.cache: dict[str, tuple[float, list[tuple[int, int, str, str]]]] = {}
+
+    def load(self, path: str = TREE_CACHE_PATH):
+        # cache entries are plain tuples keyed by mtime, so stale files are
+        # re-parsed on first use after load; parsing only ever happens for
+        # files that actually changed since the previous run
+        try:
+            with open(path, 'rb') as f:
+                self.cache = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            self.cache = {}
+
+    def save(self, path: str = TREE_CACHE_PATH):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                pickle.dump(self.cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass
+
+    def is_fresh(self, filepath: str, mtime: float | None = None) -> bool:
+        if mtime is None:
+            mtime = os.path.getmtime(filepath)
+        return filepath in self.cache and mtime <= self.cache[filepath][0]
+
+    def get(self, filepath: str, mtime: float | None = None):
+        if mtime is None:
+            mtime = os.path.getmtime(filepath)
+        if self.is_fresh(filepath, mtime):
             return self.cache[filepath][1]
 
-        with open(filepath, 'rb') as f:
-            source_code = f.read()
-        parser = tree_sitter.Parser(PY_LANG)
-        tree = parser.parse(source_code)
+        self.cache[filepath] = (mtime, _parse_file(filepath))
+        return self.cache[filepath][1]
 
-        self.cache[filepath] = (file_modified_time, tree)
-        return tree
-        
 
 tree_cache = TreeCache()
 
@@ -50,70 +149,84 @@ import line_profiler
 @line_profiler.profile
 def get_funcs(func_name: str, root_dir: str):
     # -u to whitelist venv, which has library functions
-    cmd = f'rg -u --no-messages --type py "[ \\t]*def {func_name}\\(" --max-filesize 10M --json {root_dir} | jq -c \'select(.type == "match")\''
-    rg_output_raw = subprocess.check_output(cmd, shell=True)
+    # plain output instead of --json: we only keep path and line number, so
+    # there is no point in making rg serialize (and us parse) the rest.
+    # --null delimits the path with \0, so paths containing ':' parse correctly
+    cmd = ['rg', '-u', '--no-messages', '--type', 'py', '--max-filesize', '10M',
+           '-n', '-H', '--no-heading', '--null',
+           '-e', f'^\\s*(async\\s+)?def {func_name}\\(', root_dir]
+    rg_output_raw = subprocess.run(cmd, capture_output=True).stdout
 
     func_locations = []
     for rg_output_line in rg_output_raw.splitlines():
-        rg_output = json.loads(rg_output_line)
-        filepath = rg_output['data']['path']['text']
-        line = rg_output['data']['line_number']
-        func_locations.append((filepath, line))
-
-    funcs = []
+        filepath, rest = rg_output_line.split(b'\0', 1)
+        lineno = rest.split(b':', 1)[0]
+        func_locations.append((filepath.decode('utf-8'), int(lineno)))
+
+    # one stat per file; the mtime is needed for cache validation and again
+    # for every FunctionReference, so don't re-stat per match
+    mtimes = {p: os.stat(p).st_mtime for p in {p for p, _ in func_locations}}
+
+    # parsing is GIL-bound CPU work, fan the stale files out across cores and
+    # keep only the cheap range lookup in this process
+    stale_paths = [p for p, mtime in mtimes.items() if not tree_cache.is_fresh(p, mtime)]
+    if stale_paths:
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for path, ranges in zip(stale_paths, executor.map(_parse_file, stale_paths)):
+                tree_cache.cache[path] = (mtimes[path], ranges)
+
+    # group matches by file so the cache lookup and mtime happen once per
+    # file rather than once per match
+    by_path = defaultdict(list)
     for filepath, line in func_locations:
-        tree = tree_cache.get(filepath)
-        root_node = tree.root_node
-
-        node = root_node.named_descendant_for_point_range((line - 1, 0), (line - 1, 1000))
-        if not node:
-            continue
+        by_path[filepath].append(line)
 
-        while node and node.type != 'function_definition':
-            node = node.parent
-        
-        if not node or node.type != 'function_definition':
-            continue
-
-        node_func_name = node.child_by_field_name('name').text.decode('utf-8')
-        if func_name not in node_func_name:
-            # occurs in e.g. a '# def xyz ... ' comment
-            continue
+    funcs = []
+    for filepath, lines in by_path.items():
+        ranges = tree_cache.get(filepath, mtimes[filepath])
+        mtime = mtimes[filepath]
+
+        for line in lines:
+            # innermost function containing the line: bisect to the last
+            # function starting at or before it, then walk back to the nearest
+            # one that still spans it (ranges are sorted by start row)
+            row = line - 1
+            enclosing = None
+            i = bisect.bisect_right(ranges, (row, float('inf'))) - 1
+            while i >= 0:
+                if ranges[i][1] >= row:
+                    enclosing = ranges[i]
+                    break
+                i -= 1
+            if enclosing is None:
+                continue
+
+            start_row, end_row, node_func_name, text = enclosing
+            if func_name not in node_func_name:
+                # occurs in e.g. a '# def xyz ... ' comment
+                continue
+
+            funcs.append(FunctionReference(
+                filepath,
+                start_row,
+                text,
+                mtime
+            ))
 
-        funcs.append(FunctionReference(
-            filepath,
-            node.start_point.row,
-            node.text.decode('utf-8'),
-            os.path.getmtime(filepath)
-        ))
-    
     return funcs
 
 
 def get_called_functions_and_classes(src_code: str):
-    parser = tree_sitter.Parser(PY_LANG)
-    tree = parser.parse(src_code)
-
-    query_string = """
-    [
-      ;; Case 1: Matches simple calls like `print()`
-      (call
-        function: (identifier) @function_name)
-
-      ;; Case 2: Matches attribute calls like `obj.method()`
-      ;; and captures only the final 'method' part.
-      (call
-        function: (attribute
-                   attribute: (identifier) @function_name))
-    ]
-    """
-
-    query = tree_sitter.Query(PY_LANG, query_string)
-    cursor = tree_sitter.QueryCursor(query)
+    tree = _get_parser().parse(src_code)
+
+    cursor = tree_sitter.QueryCursor(CALL_QUERY)
     matches = cursor.matches(tree.root_node)
-    functions_and_classes = list(set([m[1]['function_name'][0].text.decode('utf-8') for m in matches]) - builtin_names)
+    # dedupe and drop builtins while still in bytes, then decode only the
+    # unique survivors
+    raw_names = {m[1]['function_name'][0].text for m in matches}
+    functions_and_classes = [name.decode('utf-8') for name in raw_names - _BUILTIN_BYTES]
 
-    breakpoint()
+    return functions_and_classes
 
 # idea is that if we call a class, we drag the class body into this definition. similar for functions
 # TODO: exclude stdlib functions
@@ -152,15 +265,20 @@ def main():
     root_dir = os.path.expanduser('~/P/lineCompletion')
     func_name = r'parse'
 
+    tree_cache.load()
     start_time = time.time()
     funcs = get_funcs(func_name, root_dir)
     print('runtime', round(time.time() - start_time, 4))
+    tree_cache.save()
 
-    with open('funcs.json', 'w') as f:
-        f.write(json.dumps([dataclasses.asdict(f) for f in funcs]))
+    # orjson serializes the dataclasses directly and writes bytes, no
+    # intermediate asdict copies
+    with open('funcs.json', 'wb') as f:
+        f.write(orjson.dumps(funcs, option=orjson.OPT_SERIALIZE_DATACLASS))
 
 
-main()
+if __name__ == "__main__":
+    main()
 
 
 #     class_query = tree_sitter.Query(
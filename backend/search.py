@@ -1,65 +1,85 @@
 # TODO: make this standalone tool lib and put on github with good docs and name
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml.cssselect import CSSSelector
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 import re
-import copy
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
+# keep-alive connection pool so repeated fetches skip the TCP/TLS handshake
+_SESSION = requests.Session()
+_SESSION.verify = False
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=1)
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
+
+# compiled once; runs on every content tag of every page
+_WS_RE = re.compile(r'\s+')
+
 page_link = "https://github.com/MapIV/pypcd4"
 
 
-def find_main_content(soup: BeautifulSoup) -> BeautifulSoup:
+# precompiled, in priority order: a "main" match must beat a generic
+# 'div[class*="content"]' one no matter where each sits in the document
+POSITIVE_SELECTORS = [CSSSelector(selector) for selector in (
+    "main",
+    "article",
+    'div[id="main"]',
+    'div[id="content"]',
+    'div[class*="main-content"]',
+    'div[class*="content"]',
+    'div[class*="post"]'
+)]
+
+# one union expression so libxml2 removes all junk in a single pass
+JUNK_XPATH = (
+    './/nav | .//aside | .//footer | .//header | .//script | .//style'
+    ' | .//*[@role="navigation"] | .//*[@role="complementary"] | .//*[@role="banner"]'
+    ' | .//*[contains(@id, "sidebar")] | .//*[contains(@class, "sidebar")]'
+    ' | .//*[contains(@id, "comments")] | .//*[contains(@class, "comments")]'
+    ' | .//*[contains(@id, "footer")] | .//*[contains(@class, "footer")]'
+)
+
+
+def find_main_content(root: lxml.html.HtmlElement) -> lxml.html.HtmlElement | None:
     """
     Finds the main content of a webpage by trying a series of increasingly
-    general selectors. As a last resort, it cleans the <body> tag.
+    general selectors. As a last resort, it cleans the <body> tag in place.
     """
-    positive_selectors = [
-        "main",
-        "article",
-        'div[id="main"]',
-        'div[id="content"]',
-        'div[class*="main-content"]',
-        'div[class*="content"]',
-        'div[class*="post"]'
-    ]
-    for selector in positive_selectors:
-        container = soup.select_one(selector)
-        if container:
-            print(f"Found main content with selector: '{selector}'")
-            return container
+    for selector in POSITIVE_SELECTORS:
+        containers = selector(root)
+        if containers:
+            print(f"Found main content with selector: '{selector.css}'")
+            return containers[0]
 
     print("No specific main content container found. Falling back to cleaning <body>.")
-    
-    body = copy.copy(soup.body)
-    
-    junk_selectors = [
-        'nav', 'aside', 'footer', 'header', 'script', 'style',
-        '[role="navigation"]', '[role="complementary"]', '[role="banner"]',
-        '[id*="sidebar"]', '[class*="sidebar"]',
-        '[id*="comments"]', '[class*="comments"]',
-        '[id*="footer"]', '[class*="footer"]'
-    ]
-    
-    for junk_selector in junk_selectors:
-        for tag in body.select(junk_selector):
-            tag.decompose()
-            
-            
+
+    body = root.find('body')
+    if body is None:
+        return None
+
+    for tag in body.xpath(JUNK_XPATH):
+        parent = tag.getparent()
+        if parent is not None:
+            parent.remove(tag)
+
     return body
 
 
 class PageChunker:
-    CONTENT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'ul', 'ol', 'li', 'pre', 'code']
-    BOUNDARY_TAGS = ['h1', 'h2', 'h3', 'h4']
+    CONTENT_TAGS = frozenset({'p', 'h1', 'h2', 'h3', 'h4', 'ul', 'ol', 'li', 'pre', 'code'})
+    BOUNDARY_TAGS = frozenset({'h1', 'h2', 'h3', 'h4'})
 
     def __init__(self, merge_threshold_chars: int = 800, min_chunk_size_chars: int = 50):
         self.merge_threshold = merge_threshold_chars
         self.min_chunk_size_chars = min_chunk_size_chars
+        # built once; process() may run on many pages
+        self._tags_xpath = " | ".join(f'.//{tag}' for tag in sorted(self.CONTENT_TAGS))
         self._reset()
 
     def _reset(self):
@@ -95,27 +115,32 @@ class PageChunker:
     def process(self, page_link):
         self._reset()
         try:
-            response = requests.get(page_link, verify=False, timeout=10)
+            response = _SESSION.get(page_link, timeout=10)
             response.raise_for_status()
         except requests.exceptions.RequestException as e:
             print(f"Error fetching {page_link}: {e}")
             return []
 
-        soup = BeautifulSoup(response.text, "lxml")
-        content_container = find_main_content(soup)
-        if not content_container:
+        root = lxml.html.fromstring(response.text)
+        content_container = find_main_content(root)
+        if content_container is None:
             return []
 
         metadata = {"source": page_link}
-        for tag in content_container.find_all(self.CONTENT_TAGS):
-            if tag.find_parent(self.CONTENT_TAGS):
+        for tag in content_container.xpath(self._tags_xpath):
+            # skip tags nested inside another content tag (e.g. li inside ul)
+            parent = tag.getparent()
+            while parent is not None and parent.tag not in self.CONTENT_TAGS:
+                parent = parent.getparent()
+            if parent is not None:
                 continue
 
-            content = tag.get_text() if tag.name == 'pre' else re.sub(r'\s+', ' ', tag.get_text()).strip()
+            text = "".join(tag.itertext())
+            content = text if tag.tag == 'pre' else _WS_RE.sub(' ', text).strip()
             if not content:
                 continue
 
-            if tag.name in self.BOUNDARY_TAGS:
+            if tag.tag in self.BOUNDARY_TAGS:
                 self._flush_buffer(metadata)
                 self.buffer = [content]
                 continue
@@ -1,18 +1,29 @@
 import requests
+from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 import re
 from urllib.parse import urljoin, urlparse
-import copy
 
 # Import robust parsing libraries
 import lxml.html
 import lxml.etree
-import html2text
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
+# keep-alive connection pool so repeated fetches skip the TCP/TLS handshake
+_SESSION = requests.Session()
+_SESSION.verify = False
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=1)
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
+
+# compiled once; these run per content tag on every scraped page
+_WS_RE = re.compile(r'\s+')
+_SPACES_RE = re.compile(r'[ \t\r\f\v]+')
+_DOUBLE_NL_RE = re.compile(r'\n\s*\n')
+
 # --- UTILITY FUNCTIONS FOR ROBUST PARSING (ADAPTED FROM 2ND IMPLEMENTATION) ---
 
 def get_domain(url: str) -> str:
@@ -21,63 +32,56 @@ def get_domain(url: str) -> str:
         url = "http://" + url
     return urlparse(url).netloc
 
-def replace_node_with_text(node: lxml.html.HtmlElement, text: str):
-    """Replaces an lxml node with a text string, preserving the tail text."""
-    previous = node.getprevious()
-    parent = node.getparent()
-    if parent is None: return
-    tail = node.tail or ""
-    if previous is not None:
-        previous.tail = (previous.tail or "") + text + tail
-    else:
-        parent.text = (parent.text or "") + text + tail
-    parent.remove(node)
-
-def clean_links_in_element(element: lxml.html.HtmlElement, base_url: str):
-    """Replaces hyperlink tags within a given element with a readable format."""
-    for a_tag in element.xpath(".//a[@href]"):
-        href = a_tag.get("href")
-        if not href or href.startswith(("mailto:", "javascript:")):
-            text = ' '.join(a_tag.itertext()).strip()
-            replace_node_with_text(a_tag, text) # Keep text, remove link
-            continue
-        full_url = urljoin(base_url, href)
-        text = re.sub(r'\s+', ' ', ' '.join(a_tag.itertext())).strip()
-        if not text:
-            text = get_domain(full_url)
-        replacement = f"{text}" # Keep the text simple, as link map is in metadata
-        replace_node_with_text(a_tag, replacement)
-
-def replace_images_in_element(element: lxml.html.HtmlElement):
-    """Replaces image tags within an element with a placeholder."""
-    for i, img_tag in enumerate(element.xpath(".//img")):
-        alt = img_tag.get("alt", "").strip()
-        replacement = f"[Image: {alt}]" if alt else f"[Image {i}]"
-        replace_node_with_text(img_tag, replacement)
+# tags that should start/end on their own line in the rendered text
+_BLOCK_TAGS = frozenset({'p', 'div', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'pre', 'br', 'table', 'tr'})
+
+def _render_element(el: lxml.html.HtmlElement, base_url: str, parts: list):
+    """Appends the readable text of an element to parts, resolving links and
+    images inline. Walks the original tree; never copies or mutates it."""
+    tag = el.tag
+    if tag == 'a':
+        href = el.get('href')
+        text = _WS_RE.sub(' ', ' '.join(el.itertext())).strip()
+        if not text and href and not href.startswith(("mailto:", "javascript:")):
+            text = get_domain(urljoin(base_url, href))
+        parts.append(text)
+        return
+    if tag == 'img':
+        alt = (el.get('alt') or '').strip()
+        parts.append(f"[Image: {alt}]" if alt else "[Image]")
+        return
+
+    if tag == 'li':
+        parts.append('\n* ')
+    elif tag in _BLOCK_TAGS:
+        parts.append('\n')
+    if el.text:
+        parts.append(el.text)
+    for child in el:
+        if isinstance(child.tag, str):  # skip comments and processing instructions
+            _render_element(child, base_url, parts)
+        if child.tail:
+            parts.append(child.tail)
+    if tag == 'li' or tag in _BLOCK_TAGS:
+        parts.append('\n')
 
 def get_clean_text_for_element(element: lxml.html.HtmlElement, base_url: str) -> str:
     """
-    Takes a single lxml element, cleans it, and returns its text content
-    using html2text to preserve formatting like lists and newlines.
+    Takes a single lxml element and returns its readable text content.
+    Builds the text directly off the tree, so there is no deepcopy and no
+    serialize/re-parse round trip through html2text per tag.
     """
-    # Deep copy to avoid modifying the tree while iterating
-    el_copy = copy.deepcopy(element)
-    
-    # Run cleaning functions on the copied element
-    clean_links_in_element(el_copy, base_url)
-    replace_images_in_element(el_copy)
+    # most content tags are plain paragraphs; skip the recursive render when
+    # nothing inside needs list/code layout or an image placeholder
+    if not element.xpath('.//li | .//pre | .//code | .//img'):
+        return _WS_RE.sub(' ', ' '.join(element.itertext())).strip()
 
-    # Convert just this element to HTML, then to text
-    html = lxml.etree.tostring(el_copy, encoding="unicode")
-    
-    h = html2text.HTML2Text()
-    h.body_width = 0 # No wrapping
-    h.ignore_emphasis = True
-    
-    text = h.handle(html)
-    
-    # Final cleanup of excessive whitespace from html2text
-    return re.sub(r'\n\s*\n', '\n\n', text).strip()
+    parts = []
+    _render_element(element, base_url, parts)
+    text = _SPACES_RE.sub(' ', ''.join(parts))
+
+    # Final cleanup of excessive whitespace
+    return _DOUBLE_NL_RE.sub('\n\n', text).strip()
 
 def find_main_content_lxml(root: lxml.html.HtmlElement) -> lxml.html.HtmlElement:
     """
@@ -106,13 +110,15 @@ def find_main_content_lxml(root: lxml.html.HtmlElement) -> lxml.html.HtmlElement
 
 class PageChunker:
     # Whitelist of tags to extract content from.
-    CONTENT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'pre', 'div', 'span']
+    CONTENT_TAGS = frozenset({'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'pre', 'div', 'span'})
     # Tags that signify a new logical section should start.
-    BOUNDARY_TAGS = ['h1', 'h2', 'h3', 'h4']
+    BOUNDARY_TAGS = frozenset({'h1', 'h2', 'h3', 'h4'})
 
     def __init__(self, merge_threshold_chars: int = 1000, min_chunk_size_chars: int = 100):
         self.merge_threshold = merge_threshold_chars
         self.min_chunk_size_chars = min_chunk_size_chars
+        # built once; process() may run on many pages
+        self._tags_xpath = " | ".join(f'.//{tag}' for tag in sorted(self.CONTENT_TAGS))
         self._reset()
 
     def _reset(self):
@@ -132,7 +138,7 @@ class PageChunker:
     def process(self, page_link: str):
         self._reset()
         try:
-            response = requests.get(page_link, verify=False, timeout=10)
+            response = _SESSION.get(page_link, timeout=10)
             response.raise_for_status()
         except requests.exceptions.RequestException as e:
             print(f"Error fetching {page_link}: {e}")
@@ -148,18 +154,19 @@ class PageChunker:
         title = (root.findtext('.//title') or "No Title").strip()
         metadata = {"source": page_link, "title": title}
 
-        # Build an XPath query to find any of our desired content tags.
-        # This is more efficient than iterating through all elements.
-        tags_xpath = " | ".join([f".//{tag}" for tag in self.CONTENT_TAGS])
-        all_content_elements = content_container.xpath(tags_xpath)
-
-        # Create a set of the elements for quick parent checks
-        element_set = set(all_content_elements)
-
-        for tag in all_content_elements:
-            # This is the key logic: only process a tag if its parent is NOT also a content tag.
-            # This avoids processing nested content (e.g., a <p> inside a <li>) twice.
-            if tag.getparent() in element_set:
+        for tag in content_container.xpath(self._tags_xpath):
+            # Only process a tag if no ancestor *inside the container* is also
+            # a content tag, so nested content (e.g. a <p> inside a <li>)
+            # isn't emitted twice. The walk must stop at the container: the
+            # container itself is usually a div, which is a content tag here.
+            parent = tag.getparent()
+            nested = False
+            while parent is not None and parent is not content_container:
+                if parent.tag in self.CONTENT_TAGS:
+                    nested = True
+                    break
+                parent = parent.getparent()
+            if nested:
                 continue
 
             # Use our robust function to get clean text for this specific element
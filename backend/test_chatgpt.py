@@ -1,5 +1,8 @@
-from openai import OpenAI
-client = OpenAI()
+import asyncio
+import time
+
+from openai import AsyncOpenAI
+client = AsyncOpenAI()
 
 prompt = f'''\
 You are a code completion assistant.
@@ -14,15 +17,23 @@ import os
 ```
 '''
 
-import time
-start_time = time.time()
 
-for _ in range(3):
-    response = client.responses.create(
+async def one():
+    # per-request latency, not elapsed-since-benchmark-start
+    start_time = time.time()
+    response = await client.responses.create(
         model="chatgpt-4o-latest",
-        input=prompt
+        input=prompt,
+        temperature=0,
     )
-    dura = time.time() - start_time
-    print(dura)
+    print(time.time() - start_time)
+    return response
+
+
+async def main():
+    # fire the three requests in parallel; wall time drops to ~one RTT
+    return await asyncio.gather(*[one() for _ in range(3)])
+
 
-print(response.output_text)
+responses = asyncio.run(main())
+print(responses[-1].output_text)